@@ -1,6 +1,7 @@
 import re
 from dataclasses import replace
 from functools import reduce, singledispatch
+from operator import is_
 from typing import Callable, Iterable, Sequence, TypeVar, Union
 
 from knitscript.astnodes import Block, Call, ExpandingStitchRepeat, \
@@ -16,6 +17,9 @@ def ast_map(node: Node, function: Callable[[Node], Node]) -> Node:
     """
     Calls the mapping function on each of the node's children.
 
+    If the mapping function returns every child unchanged, the original node is
+    returned instead of a copy.
+
     :param node: the AST to map
     :param function: the mapping function
     :return:
@@ -25,50 +29,75 @@ def ast_map(node: Node, function: Callable[[Node], Node]) -> Node:
 
 @ast_map.register
 def _(rep: FixedStitchRepeat, function: Callable[[Node], Node]) -> Node:
-    return replace(rep,
-                   stitches=list(map(function, rep.stitches)),
-                   times=function(rep.times))
+    return replace_changed(rep,
+                           stitches=list(map(function, rep.stitches)),
+                           times=function(rep.times))
 
 
 @ast_map.register
 def _(rep: ExpandingStitchRepeat, function: Callable[[Node], Node]) -> Node:
-    return replace(rep,
-                   stitches=list(map(function, rep.stitches)),
-                   to_last=function(rep.to_last))
+    return replace_changed(rep,
+                           stitches=list(map(function, rep.stitches)),
+                           to_last=function(rep.to_last))
 
 
 @ast_map.register
 def _(row: Row, function: Callable[[Node], Node]) -> Node:
-    return replace(row, stitches=list(map(function, row.stitches)))
+    return replace_changed(row, stitches=list(map(function, row.stitches)))
 
 
 @ast_map.register
 def _(rep: RowRepeat, function: Callable[[Node], Node]) -> Node:
-    return replace(rep,
-                   rows=list(map(function, rep.rows)),
-                   times=function(rep.times))
+    return replace_changed(rep,
+                           rows=list(map(function, rep.rows)),
+                           times=function(rep.times))
 
 
 @ast_map.register
 def _(block: Block, function: Callable[[Node], Node]) -> Node:
-    return replace(block, patterns=list(map(function, block.patterns)))
+    return replace_changed(block,
+                           patterns=list(map(function, block.patterns)))
 
 
 @ast_map.register
 def _(pattern: Pattern, function: Callable[[Node], Node]) -> Node:
-    return replace(pattern, rows=list(map(function, pattern.rows)))
+    return replace_changed(pattern, rows=list(map(function, pattern.rows)))
 
 
 @ast_map.register
 def _(rep: FixedBlockRepeat, function: Callable[[Node], Node]) -> Node:
-    return replace(rep, block=function(rep.block), times=function(rep.times))
+    return replace_changed(rep,
+                           block=function(rep.block),
+                           times=function(rep.times))
 
 
 @ast_map.register
 def _(call: Call, function: Callable[[Node], Node]) -> Node:
-    return replace(call,
-                   target=function(call.target),
-                   args=list(map(function, call.args)))
+    return replace_changed(call,
+                           target=function(call.target),
+                           args=list(map(function, call.args)))
+
+
+def replace_changed(node: Node, **changes: object) -> Node:
+    """
+    Replaces fields of the node, unless every new value is the same as the old
+    one. Sequences are the same if they hold the same nodes in the same order.
+
+    :param node: the node to replace fields of
+    :param changes: the new values of the fields
+    :return: the original node if nothing changed, or a copy with the changes
+    """
+    if all(_is_same(value, getattr(node, name))
+           for name, value in changes.items()):
+        return node
+    return replace(node, **changes)
+
+
+def _is_same(new: object, old: object) -> bool:
+    if new is old:
+        return True
+    return (isinstance(new, list) and isinstance(old, Sequence) and
+            len(new) == len(old) and all(map(is_, new, old)))
 
 
 # noinspection PyUnusedLocal
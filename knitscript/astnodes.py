@@ -29,8 +29,10 @@ class Side(Enum):
             a generator for the infinite series: self, self.flip(),
             self.flip().flip(), ...
         """
-        yield self
-        yield from self.flip().alternate()
+        side = self
+        while True:
+            yield side
+            side = side.flip()
 
     def __str__(self) -> str:
         return self.value
@@ -55,6 +57,10 @@ class Node:
     """
     An AST node.
 
+    Nodes are never changed after they are created, including the lists they
+    hold, so a node can be shared between ASTs and reused by passes that leave
+    it unchanged.
+
     :cvar sources: the source file locations this node was created from
     """
     sources: Sequence[Source] = field(compare=False)
@@ -115,9 +121,16 @@ class NaturalLit(Node):
         :param value: the value of this literal
         :return: the literal representing this value
         """
+        if 0 <= value < len(_SMALL_NATURALS):
+            return _SMALL_NATURALS[value]
         return NaturalLit(value=value, sources=[])
 
 
+# The small numbers used for most repeat counts are created once.
+_SMALL_NATURALS = tuple(NaturalLit(value=value, sources=[])
+                        for value in range(256))
+
+
 @dataclass(frozen=True)
 class StringLit(Node):
     """
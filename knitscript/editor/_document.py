@@ -1,7 +1,7 @@
 import os
 from tkinter import Misc
 from tkinter.ttk import Frame
-from typing import Optional, TextIO
+from typing import Callable, Optional, TextIO
 
 
 class FileDocument(Frame):
@@ -16,6 +16,7 @@ class FileDocument(Frame):
         super().__init__(master)
         self._file = None
         self._text = ""
+        self._text_source = None
         self._modified = False
 
     def new(self) -> None:
@@ -24,6 +25,7 @@ class FileDocument(Frame):
             self._file.close()
         self._file = None
         self._text = ""
+        self._text_source = None
         self._modified = False
         self.event_generate("<<Opened>>")
 
@@ -37,13 +39,14 @@ class FileDocument(Frame):
             self._file.close()
         self._file = file
         self._text = self._file.read()
+        self._text_source = None
         self.modified = False
         self.event_generate("<<Opened>>")
 
     def save(self) -> None:
         """Saves the current document to its original file."""
         self._file.seek(0)
-        self._file.write(self._text)
+        self._file.write(self.text)
         self._file.truncate()
         self.modified = False
 
@@ -79,11 +82,26 @@ class FileDocument(Frame):
         or if it was reset to its original state after an undo. You should set
         :ref:`modified` to the right value after setting the text.
         """
+        if self._text_source is not None:
+            self._text = self._text_source()
+            self._text_source = None
         return self._text
 
     @text.setter
     def text(self, value: str) -> None:
         self._text = value
+        self._text_source = None
+        self.event_generate("<<Set>>")
+
+    def set_text_source(self, source: Callable[[], str]) -> None:
+        """
+        Sets the text of the current document to the result of a function, but
+        only calls the function the next time the text is needed. This makes it
+        cheap to set the text many times in a row.
+
+        :param source: a function that returns the new text
+        """
+        self._text_source = source
         self.event_generate("<<Set>>")
 
     @property
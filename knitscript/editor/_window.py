@@ -1,22 +1,27 @@
 import os
 import platform
-from functools import partial, wraps
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, partial, wraps
 from idlelib.redirector import WidgetRedirector
 from io import StringIO
 from itertools import takewhile
+from math import ceil
+from time import monotonic
 from tkinter import BOTH, DISABLED, END, Event, FLAT, INSERT, LEFT, Menu, \
     NORMAL, NS, NSEW, RIGHT, SEL, SEL_FIRST, SEL_LAST, TclError, Text, Tk, \
     VERTICAL, WORD, Widget, Y, YES, filedialog, messagebox
 from tkinter.font import Font, nametofont
 from tkinter.ttk import Frame, Scrollbar, Separator
-from typing import Callable, TypeVar
+from typing import Callable, Optional, Tuple, TypeVar
 
 from knitscript.editor._document import FileDocument
 from knitscript.loader import load_text
 
 _T = TypeVar("_T")
 
-if platform.system() == "Darwin":
+_SYSTEM = platform.system()
+
+if _SYSTEM == "Darwin":
     _KEYS = {
         "new": ("Cmd+N", "<Command-n>"),
         "open": ("Cmd+O", "<Command-o>"),
@@ -57,6 +62,12 @@ _DEFAULT_DOCUMENT = ("pattern hello\n" +
                      "\n" +
                      "show (hello)")
 
+# The maximum number of edits that can be undone.
+_MAX_UNDO = 1000
+
+# How often to check if a preview has finished rendering, in milliseconds.
+_POLL_DELAY = 20
+
 _EXTENSION = ".ks"
 _FILE_TYPES = [("KnitScript Document", "*" + _EXTENSION),
                ("All Files", "*.*")]
@@ -86,12 +97,20 @@ class Window(Frame):
         self._editor.grid(row=0, column=0, sticky=NSEW)
         self._editor.focus_set()
 
-        def update_title() -> None:
-            self.master.title(self._document.name +
-                              (" — Edited" if self._document.modified else ""))
+        title = self._document.name
+
+        def update_title(_event: Event) -> None:
+            # Saving or opening a document can send more than one of these
+            # events at once, so only update the title if it changed.
+            nonlocal title
+            new_title = (self._document.name +
+                         (" — Edited" if self._document.modified else ""))
+            if new_title != title:
+                title = new_title
+                self.master.title(title)
 
         for name in "<<Opened>>", "<<Modified>>", "<<SavedAs>>":
-            self._document.bind(name, lambda event: update_title(), add=True)
+            self._document.bind(name, update_title, add=True)
 
         sep = Separator(self, orient=VERTICAL)
         sep.grid(row=0, column=1, sticky=NS)
@@ -212,22 +231,23 @@ class _Editor(Frame):
         """
         super().__init__(master, **kwargs)
         self.pack_propagate(False)
-        text = Text(self, undo=True, font=_get_fixed_font(), wrap=WORD,
-                    padx=5, pady=5, relief=FLAT, highlightthickness=0)
+        text = Text(self, undo=True, maxundo=_MAX_UNDO,
+                    font=_get_fixed_font(), wrap=WORD, padx=5, pady=5,
+                    relief=FLAT, highlightthickness=0)
 
         menu = _create_edit_menu(text)
         text.bind(_BUTTONS["context_menu"], partial(_show_context_menu, menu),
                   add=True)
 
         scrollbar = Scrollbar(self, command=text.yview)
-        text.configure(yscrollcommand=scrollbar.set)
+        text.configure(yscrollcommand=_scroll_setter(scrollbar))
         scrollbar.pack(side=RIGHT, fill=Y)
         text.pack(side=LEFT, expand=YES, fill=BOTH)
         self.bind("<FocusIn>", lambda event: text.focus_set())
 
         # TODO:
         #  This is kind of a hack to stop Ctrl-O from inserting a new line. :/
-        if platform.system() != "Darwin":
+        if _SYSTEM != "Darwin":
             def on_open(_event: Event) -> str:
                 self.master.open()
                 return "break"
@@ -246,10 +266,20 @@ class _Editor(Frame):
 
         text.bind("<Return>", on_enter)
 
+        def get_text() -> str:
+            return _strip_trailing_newline(text.get("1.0", END))
+
         def on_change(operation: Callable[..., None], *args) -> None:
             operation(*args)
-            document.text = _strip_trailing_newline(text.get("1.0", END))
-            document.modified = text.edit_modified()
+            # Copying the text is expensive for large documents, so let the
+            # document copy it only when the text is actually needed.
+            document.set_text_source(get_text)
+            # Once the document is modified, the <<Modified>> binding below
+            # keeps it in sync, so only ask Tk for the first edit. That edit
+            # still needs to be caught here, since the <<Modified>> event is
+            # queued and might not arrive before the next save or close.
+            if not document.modified:
+                document.modified = text.edit_modified()
 
         redirector = WidgetRedirector(text)
         insert = redirector.register("insert", None)
@@ -267,10 +297,12 @@ class _Editor(Frame):
             text.bind("<<Modified>>", on_text_modified, add=True)
 
         text.insert("1.0", document.text)
+        text.edit_reset()
         self.after_idle(bind_text_modified)
 
         def on_document_opened(_event: Event) -> None:
             text.replace("1.0", END, document.text)
+            text.edit_reset()
             text.edit_modified(False)
 
         def on_document_modified(_event: Event) -> None:
@@ -300,7 +332,7 @@ class _Preview(Frame):
                           font=_get_default_font(), wrap=WORD, padx=5, pady=5,
                           relief=FLAT,
                           bg=("systemSheetBackground"
-                              if platform.system() == "Darwin"
+                              if _SYSTEM == "Darwin"
                               else "systemMenu"),
                           highlightthickness=0)
 
@@ -313,27 +345,130 @@ class _Preview(Frame):
         redirector.register("delete", lambda *args: "break")
 
         scrollbar = Scrollbar(self, command=self._text.yview)
-        self._text.configure(yscrollcommand=scrollbar.set)
+        self._text.configure(yscrollcommand=_scroll_setter(scrollbar))
         scrollbar.pack(side=RIGHT, fill=Y)
         self._text.pack(side=LEFT, expand=YES, fill=BOTH)
 
         self._document = document
-        self._document.bind("<<Opened>>", self._preview, add=True)
+        self._last_source = None
+        self._last_output = ""
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        # Only one render runs at a time, so they can share an output buffer.
+        self._output = StringIO()
+        self._dirty = False
+        self._base_dir = None
+        self._update_base_dir()
+        # The base directory needs to be updated before the preview is.
+        for name in "<<Opened>>", "<<SavedAs>>":
+            self._document.bind(name, self._update_base_dir, add=True)
+
+        def on_opened(_event: Event) -> None:
+            # Modules pulled in with "using" may have changed since the
+            # document was last rendered, so always render a reopened file.
+            self._last_source = None
+            self._preview()
+
+        self._document.bind("<<Opened>>", on_opened, add=True)
         self._document.bind("<<Set>>", _debounce(master, 500)(self._preview),
                             add=True)
+
+        def on_map(_event: Event) -> None:
+            if self._dirty:
+                self._preview()
+
+        # The top-level window gets map events for its descendants too, and
+        # this also catches the window being restored after it is minimized.
+        self.winfo_toplevel().bind("<Map>", on_map, add=True)
+
+        def on_destroy(event: Event) -> None:
+            # Drop any queued render and stop the worker once it's idle. A
+            # render that is already running can't be interrupted, so it still
+            # finishes, but its result is ignored.
+            if event.widget is self:
+                if self._pending is not None:
+                    self._pending.cancel()
+                    self._pending = None
+                self._executor.shutdown(wait=False)
+
+        self.bind("<Destroy>", on_destroy, add=True)
         self._preview()
 
     def _preview(self, _event: Event = None) -> None:
-        output = StringIO()
-        try:
-            load_text(self._document.text, output,
-                      (os.path.dirname(self._document.file.name)
-                       if self._document.file is not None
-                       else None))
-        except Exception as e:
-            # TODO: Catching all exceptions is too broad.
-            output.write(f"error: {e}\n")
-        self._text.replace("1.0", END, output.getvalue())
+        # There's no point in rendering the preview if no one can see it, so
+        # wait until it's shown again.
+        if not self.winfo_viewable():
+            self._dirty = True
+            return
+        self._dirty = False
+
+        # The preview can be triggered without the document actually changing
+        # (e.g., by an edit that is undone before the debounce fires), so skip
+        # rendering it again.
+        source = self._document.text, self._base_dir
+        if source == self._last_source:
+            return
+        self._last_source = source
+
+        # Loading the document can take a while, so do it on a background
+        # thread to keep the editor responsive. Only the most recent render is
+        # shown; older ones are cancelled or ignored.
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = self._executor.submit(_render, self._output, *source)
+        self._poll(self._pending)
+
+    def _update_base_dir(self, _event: Event = None) -> None:
+        self._base_dir = (os.path.dirname(self._document.file.name)
+                          if self._document.file is not None
+                          else None)
+
+    def _poll(self, future: Future) -> None:
+        # Tk widgets can only be used from the main thread, so check on the
+        # render from here instead of using a callback on the worker thread.
+        if future is not self._pending:
+            return
+        if not future.done():
+            self.after(_POLL_DELAY, self._poll, future)
+            return
+        self._pending = None
+        self._show(future.result())
+
+    def _show(self, new_output: str) -> None:
+        if new_output == self._last_output:
+            return
+        if _has_astral(self._last_output) or _has_astral(new_output):
+            # Tcl counts characters outside the BMP as two, so offsets into the
+            # Python strings don't line up with Tk indices.
+            self._text.replace("1.0", END, new_output)
+        else:
+            # Replacing the text makes Tk lay out the whole widget again, so
+            # only replace the part of the output that actually changed.
+            start, old_end, new_end = _changed_span(self._last_output,
+                                                    new_output)
+            self._text.replace(f"1.0 + {start} chars",
+                               f"1.0 + {old_end} chars",
+                               new_output[start:new_end])
+        self._last_output = new_output
+
+
+def _render(output: StringIO, text: str, base_dir: Optional[str]) -> str:
+    """
+    Loads a KnitScript document and returns its output, including any errors.
+
+    :param output: the buffer to write the output to, which is cleared first
+    :param text: the contents of the document
+    :param base_dir: the base directory to use for importing modules
+    :return: the output of the document
+    """
+    output.seek(0)
+    output.truncate()
+    try:
+        load_text(text, output, base_dir)
+    except Exception as e:
+        # TODO: Catching all exceptions is too broad.
+        output.write(f"error: {e}\n")
+    return output.getvalue()
 
 
 def _debounce(widget, delay: int) \
@@ -351,43 +486,127 @@ def _debounce(widget, delay: int) \
         a decorator for debouncing a function using the given widget and delay
     """
     timer_id = None
+    deadline = 0.0
 
     def decorator(function: Callable[..., _T]) -> Callable[..., None]:
+        last_args = ()
+        last_kwargs = {}
+
+        def fire() -> None:
+            # Instead of cancelling and rescheduling the timer on every call,
+            # the timer is left running and re-armed for the time remaining
+            # when it goes off early.
+            nonlocal timer_id
+            remaining = ceil((deadline - monotonic()) * 1000)
+            if remaining > 0:
+                timer_id = widget.after(remaining, fire)
+            else:
+                timer_id = None
+                function(*last_args, **last_kwargs)
+
         @wraps(function)
         def wrapper(*args, **kwargs) -> None:
-            nonlocal timer_id
-            if timer_id is not None:
-                widget.after_cancel(timer_id)
-            timer_id = widget.after(delay, lambda: function(*args, **kwargs))
+            nonlocal timer_id, deadline, last_args, last_kwargs
+            deadline = monotonic() + delay / 1000
+            last_args = args
+            last_kwargs = kwargs
+            if timer_id is None:
+                timer_id = widget.after(delay, fire)
 
         return wrapper
 
     return decorator
 
 
+# Fonts are shared by every widget that uses them, so don't configure the
+# fonts returned by these functions.
+@lru_cache()
 def _get_default_font() -> Font:
     font = nametofont("TkDefaultFont").copy()
-    font.configure(size=13 if platform.system() == "Darwin" else 11)
+    font.configure(size=13 if _SYSTEM == "Darwin" else 11)
     return font
 
 
+@lru_cache()
 def _get_fixed_font() -> Font:
     font = nametofont("TkFixedFont").copy()
-    font.configure(size=13 if platform.system() == "Darwin" else 11)
-    if platform.system() == "Windows":
+    font.configure(size=13 if _SYSTEM == "Darwin" else 11)
+    if _SYSTEM == "Windows":
         font.configure(family="Consolas")
     return font
 
 
 def _strip_trailing_newline(s: str) -> str:
-    if len(s) >= 2 and s[-2:] == "\r\n":
+    if s.endswith("\r\n"):
         return s[:-2]
-    elif len(s) >= 1 and s[-1] == "\n":
+    elif s.endswith("\n"):
         return s[:-1]
     else:
         return s
 
 
+def _changed_span(old: str, new: str) -> Tuple[int, int, int]:
+    """
+    Finds the span of text that is different between two strings, ignoring
+    their common prefix and suffix.
+
+    :param old: the old string
+    :param new: the new string
+    :return:
+        the start of the span, the end of the span in the old string, and the
+        end of the span in the new string
+    """
+    limit = min(len(old), len(new))
+    start = _bisect_common(limit, lambda n: old[:n] == new[:n])
+    end = _bisect_common(limit - start,
+                         lambda n: old[len(old) - n:] == new[len(new) - n:])
+    return start, len(old) - end, len(new) - end
+
+
+def _has_astral(s: str) -> bool:
+    """
+    Checks if a string has any characters outside the Basic Multilingual Plane.
+
+    :param s: the string to check
+    :return: True if any character is above U+FFFF, otherwise False
+    """
+    return not s.isascii() and max(s) > "\uffff"
+
+
+def _bisect_common(limit: int, matches: Callable[[int], bool]) -> int:
+    # Slice comparisons run in C, so a binary search over them is much faster
+    # than comparing the strings one character at a time in Python.
+    lo = 0
+    hi = limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if matches(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _scroll_setter(scrollbar: Scrollbar) -> Callable[[str, str], None]:
+    """
+    Creates a scroll command that only updates the scrollbar when the visible
+    range has changed, since Tk can call it many times with the same range
+    while scrolling or laying out text.
+
+    :param scrollbar: the scrollbar to update
+    :return: a function that can be used as a widget's scroll command
+    """
+    visible = None
+
+    def set_(first: str, last: str) -> None:
+        nonlocal visible
+        if (first, last) != visible:
+            visible = first, last
+            scrollbar.set(first, last)
+
+    return set_
+
+
 def _to_state(b: bool) -> str:
     return NORMAL if b else DISABLED
 
@@ -1,11 +1,10 @@
 from functools import singledispatch
+from typing import List, Sequence
 
 from knitscript.astnodes import ExpandingStitchRepeat, FixedStitchRepeat, \
     Node, Pattern, Row, RowRepeat, StitchLit
-from knitscript._asttools import to_fixed_repeat
 
 
-@singledispatch
 def export_text(node: Node) -> str:
     """
     Exports the AST to human-readable knitting instructions in plain text.
@@ -13,51 +12,77 @@ def export_text(node: Node) -> str:
     :param node: the AST to export
     :return: the instructions for the expression
     """
+    out = []
+    _export(node, out)
+    return "".join(out)
+
+
+# noinspection PyUnusedLocal
+@singledispatch
+def _export(node: Node, out: List[str]) -> None:
+    """
+    Exports the AST to plain text by appending each piece of the instructions
+    to a list, which avoids building intermediate strings for every node.
+
+    :param node: the AST to export
+    :param out: the list to append the instructions to
+    """
     raise TypeError(f"unsupported node {type(node).__name__}")
 
 
-@export_text.register
-def _(stitch: StitchLit) -> str:
-    return stitch.value.symbol
+@_export.register
+def _(stitch: StitchLit, out: List[str]) -> None:
+    out.append(stitch.value.symbol)
 
 
-@export_text.register
-def _(rep: FixedStitchRepeat) -> str:
-    stitches = ", ".join(map(export_text, rep.stitches))
+@_export.register
+def _(rep: FixedStitchRepeat, out: List[str]) -> None:
     if rep.times.value == 1:
-        return stitches
+        _export_all(rep.stitches, ", ", out)
     elif len(rep.stitches) == 1:
-        return f"{stitches} {rep.times.value}"
+        _export_all(rep.stitches, ", ", out)
+        out.append(f" {rep.times.value}")
     else:
-        return f"[{stitches}] {rep.times.value}"
+        out.append("[")
+        _export_all(rep.stitches, ", ", out)
+        out.append(f"] {rep.times.value}")
 
 
-@export_text.register
-def _(rep: ExpandingStitchRepeat) -> str:
-    stitches = export_text(to_fixed_repeat(rep))
+@_export.register
+def _(rep: ExpandingStitchRepeat, out: List[str]) -> None:
+    out.append("*")
+    _export_all(rep.stitches, ", ", out)
     if rep.to_last.value == 0:
-        return f"*{stitches}; rep from * to end"
+        out.append("; rep from * to end")
     else:
-        return f"*{stitches}; rep from * to last {rep.to_last.value}"
+        out.append(f"; rep from * to last {rep.to_last.value}")
 
 
-@export_text.register
-def _(row: Row) -> str:
-    return (
-        f"{row.side}: {export_text(to_fixed_repeat(row))}. " +
-        f"({row.produces} sts)"
-    )
+@_export.register
+def _(row: Row, out: List[str]) -> None:
+    out.append(f"{row.side}: ")
+    _export_all(row.stitches, ", ", out)
+    out.append(f". ({row.produces} sts)")
 
 
-@export_text.register
-def _(rep: RowRepeat) -> str:
-    rows = "\n".join(map(export_text, rep.rows))
+@_export.register
+def _(rep: RowRepeat, out: List[str]) -> None:
     if rep.times.value == 1:
-        return rows
+        _export_all(rep.rows, "\n", out)
     else:
-        return f"**\n{rows}\nrep from ** {rep.times.value} times"
+        out.append("**\n")
+        _export_all(rep.rows, "\n", out)
+        out.append(f"\nrep from ** {rep.times.value} times")
+
+
+@_export.register
+def _(pattern: Pattern, out: List[str]) -> None:
+    _export_all(pattern.rows, "\n", out)
 
 
-@export_text.register
-def _(pattern: Pattern) -> str:
-    return export_text(to_fixed_repeat(pattern))
+def _export_all(nodes: Sequence[Node], separator: str, out: List[str]) \
+        -> None:
+    for i, node in enumerate(nodes):
+        if i > 0:
+            out.append(separator)
+        _export(node, out)
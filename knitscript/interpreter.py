@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+from collections import ChainMap
 from dataclasses import replace
 from functools import partial, singledispatch, reduce
-from itertools import accumulate, chain, starmap, takewhile, zip_longest
+from itertools import chain, starmap, takewhile, zip_longest
 from math import ceil, gcd
 from operator import attrgetter
 from typing import Callable, Iterable, Iterator, Generator, Mapping, \
@@ -11,7 +12,8 @@ from typing import Callable, Iterable, Iterator, Generator, Mapping, \
 from knitscript.astnodes import Block, Call, ExpandingStitchRepeat, \
     FixedBlockRepeat, FixedStitchRepeat, Get, Knittable, NativeFunction, \
     NaturalLit, Node, Pattern, Row, RowRepeat, Side, StitchLit
-from knitscript._asttools import Error, ast_map, ast_reduce, to_fixed_repeat
+from knitscript._asttools import Error, ast_map, ast_reduce, replace_changed, \
+    to_fixed_repeat
 from knitscript.stitch import Stitch
 
 _T = TypeVar("_T")
@@ -36,9 +38,9 @@ def interpret_pattern(pattern: Pattern) -> Pattern:
     pattern = _flatten(pattern)
     pattern = infer_counts(pattern)  # Re-count unrolled row repeats.
     pattern = _combine_stitches(pattern)
-    pattern = _alternate_sides(
-        pattern, Side.Wrong if _starts_with_cast_ons(pattern) else Side.Right
-    )
+    # Flattening removes empty row repeats, which can change the first row, so
+    # the starting side has to be found again.
+    pattern = _alternate_sides(pattern, _initial_side(pattern))
     pattern = _roll_repeated_rows(pattern)
     pattern = _flatten(pattern)  # Flatten newly rolled up row repeats.
     assert isinstance(pattern, Pattern)
@@ -134,18 +136,23 @@ def do_call(call: Call, env: Mapping[str, Node]) -> Optional[Node]:
     target = call.target
     if isinstance(target, Get):
         target = substitute(target, env)
-    # noinspection PyTypeChecker
-    args = map(partial(substitute, env=env), call.args)
     assert isinstance(target, Pattern) or isinstance(target, NativeFunction)
+    if (isinstance(target, Pattern) and
+            len(target.params) != len(call.args)):
+        raise InterpretError(
+            f"called pattern with {len(call.args)} arguments, but " +
+            f"expected {len(target.params)}",
+            call
+        )
+    # Substitute the arguments only after checking the arity, so that a wrong
+    # number of arguments is reported before any error inside them.
+    args = [substitute(arg, env) for arg in call.args]
     if isinstance(target, Pattern):
-        if len(target.params) != len(call.args):
-            raise InterpretError(
-                f"called pattern with {len(call.args)} arguments, but " +
-                f"expected {len(target.params)}",
-                call
-            )
+        # Chain the arguments in front of the pattern's environment instead of
+        # copying the whole environment for every call.
         return substitute(replace(target, params=[]),
-                          {**target.env, **dict(zip(target.params, args))})
+                          ChainMap(dict(zip(target.params, args)),
+                                   target.env))
     elif isinstance(target, NativeFunction):
         return target.function(*args)
 
@@ -314,10 +321,15 @@ def _(block: Block, available: Optional[int] = None) -> Node:
         counted = [infer_counts(block.patterns[0], available)]
     else:
         counted = list(map(infer_counts, block.patterns))
+    consumes = 0
+    produces = 0
+    for pattern in counted:
+        consumes += pattern.consumes
+        produces += pattern.produces
     return replace(block,
                    patterns=counted,
-                   consumes=sum(map(attrgetter("consumes"), counted)),
-                   produces=sum(map(attrgetter("produces"), counted)))
+                   consumes=consumes,
+                   produces=produces)
 
 
 @infer_counts.register
@@ -376,8 +388,8 @@ def _(rep: FixedStitchRepeat, unroll: bool = False) -> Node:
         )
     else:
         stitches = []
-        # noinspection PyTypeChecker
-        for stitch in map(partial(_flatten, unroll=unroll), rep.stitches):
+        for stitch in rep.stitches:
+            stitch = _flatten(stitch, unroll)
             if (isinstance(stitch, FixedStitchRepeat) and
                     stitch.times.value == 1):
                 # Un-nest fixed stitch repeats that only repeat once.
@@ -399,8 +411,8 @@ def _(row: Row, unroll: bool = False) -> Node:
 @_flatten.register
 def _(rep: RowRepeat, unroll: bool = False) -> Node:
     flattened_rows = []
-    # noinspection PyTypeChecker
-    for row in map(partial(_flatten, unroll=unroll), rep.rows):
+    for row in rep.rows:
+        row = _flatten(row, unroll)
         if isinstance(row, RowRepeat) and (unroll or row.times.value <= 1):
             flattened_rows.extend(_repeat_rows(row.rows, row.times.value))
         elif isinstance(row, Pattern):
@@ -433,9 +445,8 @@ def _(pattern: Pattern, unroll: bool = False) -> Node:
 
 @_flatten.register
 def _(block: Block, unroll: bool = False) -> Node:
-    # noinspection PyTypeChecker
-    return _merge_across(*map(partial(_flatten, unroll=unroll),
-                              block.patterns))
+    return _merge_across(*[_flatten(pattern, unroll)
+                           for pattern in block.patterns])
 
 
 @_flatten.register
@@ -487,19 +498,23 @@ def _reverse(node: Node, before: int) -> Node:
 # noinspection PyUnusedLocal
 @_reverse.register
 def _(rep: FixedStitchRepeat, before: int) -> Node:
-    before_acc = accumulate(
-        chain([before], map(attrgetter("consumes"), rep.stitches[:-1]))
-    )
-    return replace(rep, stitches=list(map(_reverse,
-                                          reversed(rep.stitches),
-                                          reversed(list(before_acc)))))
+    befores = []
+    for stitch in rep.stitches:
+        befores.append(before)
+        before += stitch.consumes
+    return replace(rep, stitches=[
+        _reverse(stitch, stitch_before)
+        for stitch, stitch_before in zip(reversed(rep.stitches),
+                                         reversed(befores))
+    ])
 
 
 # noinspection PyUnusedLocal
 @_reverse.register
 def _(stitch: StitchLit, before: int) -> Node:
-    if stitch.value.reverse is not None:
-        return replace(stitch, value=stitch.value.reverse)
+    reverse = stitch.value.reverse
+    if reverse is not None:
+        return replace(stitch, value=reverse)
     else:
         raise InterpretError(f"Cannot reverse stitch {stitch.value}", stitch)
 
@@ -543,11 +558,7 @@ def _infer_sides(node: Node, side: Side = Side.Right) -> Node:
 # noinspection PyUnusedLocal
 @_infer_sides.register
 def _(pattern: Pattern, side: Side = Side.Right) -> Node:
-    side = Side.Wrong if _starts_with_cast_ons(pattern) else Side.Right
-    return replace(
-        pattern,
-        rows=list(map(_infer_sides, pattern.rows, side.alternate()))
-    )
+    return _infer_pattern_sides(pattern, _initial_side(pattern))
 
 
 @_infer_sides.register
@@ -565,18 +576,31 @@ def _(rep: FixedBlockRepeat, side: Side = Side.Right) -> Node:
 
 @_infer_sides.register
 def _(rep: RowRepeat, side: Side = Side.Right) -> Node:
-    return replace(rep,
-                   rows=list(map(_infer_sides, rep.rows, side.alternate())))
+    return replace_changed(
+        rep, rows=list(map(_infer_sides, rep.rows, side.alternate()))
+    )
 
 
 @_infer_sides.register
 def _(row: Row, side: Side = Side.Right) -> Node:
-    if row.side is None or row.inferred:
+    # Rows with an explicit side, or whose inferred side already matches, are
+    # kept as they are so that unchanged subtrees aren't copied.
+    if row.side is None or (row.inferred and row.side != side):
         return replace(row, side=side, inferred=True)
     else:
         return row
 
 
+def _infer_pattern_sides(pattern: Pattern, side: Side) -> Node:
+    return replace_changed(
+        pattern, rows=list(map(_infer_sides, pattern.rows, side.alternate()))
+    )
+
+
+def _initial_side(pattern: Pattern) -> Side:
+    return Side.Wrong if _starts_with_cast_ons(pattern) else Side.Right
+
+
 @singledispatch
 def _alternate_sides(node: Node, side: Side = Side.Right) -> Node:
     """
@@ -606,7 +630,7 @@ def _(rep: RowRepeat, side: Side = Side.Right) -> Node:
         rows.append(_alternate_sides(row, side))
         if num_rows % 2 != 0:
             side = side.flip()
-    return replace(rep, rows=rows)
+    return replace_changed(rep, rows=rows)
 
 
 @_alternate_sides.register
@@ -615,7 +639,7 @@ def _(pattern: Pattern, side: Side = Side.Right) -> Node:
     assert isinstance(rep, RowRepeat)
     assert rep.consumes == pattern.consumes
     assert rep.produces == pattern.produces
-    return replace(pattern, rows=rep.rows)
+    return replace_changed(pattern, rows=rep.rows)
 
 
 @singledispatch
@@ -641,32 +665,30 @@ def _(*reps: RowRepeat) -> Knittable:
         # Unroll all row repeats if we see a row and a row repeat side-by-side.
         # This is conservative, but repetitive output can be fixed up by
         # _roll_repeated_rows.
-        #
-        # noinspection PyTypeChecker
-        rows = list(
-            starmap(
-                _merge_across,
-                _padded_zip(*map(attrgetter("rows"),
-                                 map(partial(_flatten, unroll=True), reps)))
-            )
-        )
+        unrolled = [_flatten(rep, True).rows for rep in reps]
+        rows = list(starmap(_merge_across, _padded_zip(*unrolled)))
         return RowRepeat(rows=rows,
                          times=NaturalLit.of(1),
                          consumes=rows[0].consumes, produces=rows[-1].produces,
                          sources=list(_flat_map(attrgetter("sources"), reps)))
 
+    # Count the rows in one repetition of each row repeat once, since they're
+    # needed for both expanding the repeats and counting the total rows.
+    rep_rows = [sum(map(count_rows, rep.rows)) for rep in reps]
+
     # Find the smallest number of rows that all row repeats can be expanded to.
-    num_rows = _lcm(*map(lambda rep: sum(map(count_rows, rep.rows)), reps))
+    num_rows = _lcm(*rep_rows)
 
-    def expand(rep: RowRepeat) -> Iterator[Node]:
-        times = min(rep.times.value,
-                    num_rows // sum(map(count_rows, rep.rows)))
+    def expand(rep: RowRepeat, rows_per_time: int) -> Iterator[Node]:
+        times = min(rep.times.value, num_rows // rows_per_time)
         return _repeat_rows(rep.rows, times)
 
-    rows = list(starmap(_merge_across, _padded_zip(*map(expand, reps))))
+    rows = list(starmap(_merge_across,
+                        _padded_zip(*map(expand, reps, rep_rows))))
+    total_rows = max(n * rep.times.value for rep, n in zip(reps, rep_rows))
     return RowRepeat(
         rows=rows,
-        times=NaturalLit.of(ceil(max(map(count_rows, reps)) / num_rows)),
+        times=NaturalLit.of(ceil(total_rows / num_rows)),
         consumes=rows[0].consumes, produces=rows[-1].produces,
         sources=list(_flat_map(attrgetter("sources"), reps))
     )
@@ -681,23 +703,31 @@ def _(*rows: Row) -> Knittable:
     # If we're reading RS rows, we need to read the list right-to-left
     # instead of left-to-right.
     side = rows[0].side
-    rows = list(map(lambda row: row if row.side == side else _reverse(row, 0),
-                    reversed(rows) if side == Side.Right else rows))
+    rows = [row if row.side == side else _reverse(row, 0)
+            for row in (reversed(rows) if side == Side.Right else rows)]
 
     # Update the "to last" value of any expanding stitch repeat in the rows by
-    # adding the number of stitches that come after it.
-    after = map(lambda i: sum(map(attrgetter("consumes"), rows[i + 1:])),
-                range(len(rows)))
-    rows = list(map(_increase_expanding_repeats, rows, after))
-
-    # noinspection PyUnresolvedReferences
-    return Row(
-        stitches=list(chain.from_iterable(map(attrgetter("stitches"), rows))),
-        side=side, inferred=rows[0].inferred,
-        consumes=sum(map(attrgetter("consumes"), rows)),
-        produces=sum(map(attrgetter("produces"), rows)),
-        sources=list(_flat_map(attrgetter("sources"), rows))
-    )
+    # adding the number of stitches that come after it. The totals are
+    # accumulated right-to-left so each row is only counted once.
+    after = []
+    total = 0
+    for row in reversed(rows):
+        after.append(total)
+        total += row.consumes
+    after.reverse()
+
+    stitches = []
+    consumes = 0
+    produces = 0
+    sources = []
+    for row, n in zip(rows, after):
+        row = _increase_expanding_repeats(row, n)
+        stitches.extend(row.stitches)
+        consumes += row.consumes
+        produces += row.produces
+        sources.extend(row.sources)
+    return Row(stitches=stitches, side=side, inferred=rows[0].inferred,
+               consumes=consumes, produces=produces, sources=sources)
 
 
 @singledispatch
@@ -708,11 +738,10 @@ def _increase_expanding_repeats(node: Node, n: int) -> Node:
 
 @_increase_expanding_repeats.register
 def _(expanding: ExpandingStitchRepeat, n: int) -> Node:
-    # noinspection PyTypeChecker
     return replace(
         expanding,
-        stitches=list(map(partial(_increase_expanding_repeats, n=n),
-                          expanding.stitches)),
+        stitches=[_increase_expanding_repeats(stitch, n)
+                  for stitch in expanding.stitches],
         to_last=NaturalLit.of(expanding.to_last.value + n),
     )
 
@@ -737,12 +766,12 @@ def _(stitch: StitchLit, acc: bool = True) -> bool:
     return acc and stitch.value == Stitch.CAST_ON
 
 
+_EMPTY_ROW = Row(stitches=[], side=Side.Right, inferred=False,
+                 consumes=0, produces=0, sources=[])
+
+
 def _padded_zip(*rows: Node) -> Iterable[Sequence[Node]]:
-    return zip_longest(*rows,
-                       fillvalue=Row(stitches=[],
-                                     side=Side.Right, inferred=False,
-                                     consumes=0, produces=0,
-                                     sources=[]))
+    return zip_longest(*rows, fillvalue=_EMPTY_ROW)
 
 
 def _lcm(*nums: int) -> int:
@@ -756,50 +785,50 @@ def _combine_stitches(node: Node) -> Node:
 
 @_combine_stitches.register
 def _(rep: FixedStitchRepeat) -> Node:
-    # noinspection PyUnusedLocal
-    @singledispatch
-    def get_stitch(node: Node) -> Tuple[Stitch, int]:
-        raise TypeError()
-
-    @get_stitch.register
-    def _(stitch: StitchLit) -> Tuple[Stitch, int]:
-        return stitch.value, 1
-
-    # noinspection PyShadowingNames
-    @get_stitch.register
-    def _(rep: FixedStitchRepeat) -> Tuple[Stitch, int]:
-        if len(rep.stitches) != 1:
-            raise ValueError()
-        return rep.stitches[0].value, rep.times.value
-
-    def combine(acc, node):
+    # Merge runs of the same stitch into a single repeat, in place.
+    combined = []
+    for node in map(_combine_stitches, rep.stitches):
         try:
-            current_stitch, current_times = get_stitch(node)
-            last_stitch, last_times = get_stitch(acc[-1])
+            current_stitch, current_times = _get_stitch(node)
+            last_stitch, last_times = _get_stitch(combined[-1])
         except (IndexError, TypeError, ValueError):
-            return acc + [node]
+            combined.append(node)
+            continue
         if current_stitch != last_stitch:
-            return acc + [node]
+            combined.append(node)
+            continue
 
         times = current_times + last_times
-        return acc[:-1] + [
-            FixedStitchRepeat(
-                stitches=[StitchLit(value=current_stitch,
-                                    consumes=current_stitch.consumes,
-                                    produces=current_stitch.produces,
-                                    sources=acc[-1].sources + node.sources)],
-                times=NaturalLit.of(times),
-                consumes=current_stitch.consumes * times,
-                produces=current_stitch.produces * times,
-                sources=acc[-1].sources + node.sources
-            )
-        ]
+        sources = combined[-1].sources + node.sources
+        combined[-1] = FixedStitchRepeat(
+            stitches=[StitchLit(value=current_stitch,
+                                consumes=current_stitch.consumes,
+                                produces=current_stitch.produces,
+                                sources=sources)],
+            times=NaturalLit.of(times),
+            consumes=current_stitch.consumes * times,
+            produces=current_stitch.produces * times,
+            sources=sources
+        )
+    return replace(rep, stitches=combined)
 
-    # noinspection PyTypeChecker
-    return replace(
-        rep,
-        stitches=reduce(combine, map(_combine_stitches, rep.stitches), [])
-    )
+
+# noinspection PyUnusedLocal
+@singledispatch
+def _get_stitch(node: Node) -> Tuple[Stitch, int]:
+    raise TypeError()
+
+
+@_get_stitch.register
+def _(stitch: StitchLit) -> Tuple[Stitch, int]:
+    return stitch.value, 1
+
+
+@_get_stitch.register
+def _(rep: FixedStitchRepeat) -> Tuple[Stitch, int]:
+    if len(rep.stitches) != 1:
+        raise ValueError()
+    return rep.stitches[0].value, rep.times.value
 
 
 @_combine_stitches.register
@@ -1,7 +1,7 @@
 import os
 import pkgutil
 from dataclasses import dataclass
-from functools import partial
+from functools import lru_cache, partial
 from typing import Mapping, Optional, Sequence, TextIO, TypeVar, Union, \
     overload
 
@@ -67,6 +67,10 @@ def _load(in_: InputStream,
           out: Optional[TextIO],
           env: Mapping[str, Node],
           base_dir: Optional[str]) -> Mapping[str, Node]:
+    return _run(_parse(in_, out), out, env, base_dir)
+
+
+def _parse(in_: InputStream, out: Optional[TextIO]) -> Document:
     errors = _ErrorCollector()
     lexer = KnitScriptLexer(in_)
     lexer.removeErrorListeners()
@@ -80,9 +84,15 @@ def _load(in_: InputStream,
                   f"on line {error.source.line}, " +
                   f"column {error.source.column}, " +
                   f"in {error.source.file}\n")
+    assert isinstance(document, Document)
+    return document
+
 
+def _run(document: Document,
+         out: Optional[TextIO],
+         env: Mapping[str, Node],
+         base_dir: Optional[str]) -> Mapping[str, Node]:
     env = dict(env)
-    assert isinstance(document, Document)
     for stmt in document.stmts:
         if isinstance(stmt, Using):
             if base_dir is None:
@@ -154,11 +164,18 @@ def _get_default_env(out: Optional[TextIO]) -> Mapping[str, Node]:
         "width": NativeFunction.of(_width),
         "height": NativeFunction.of(_height)
     }
+    return {**env, **_run(_parse_builtins(), None, env, None)}
+
+
+@lru_cache()
+def _parse_builtins() -> Document:
+    # The builtins are loaded for every document, but parsing them only needs
+    # to happen once.
     builtins = InputStream(pkgutil
                            .get_data("knitscript.library", "builtins.ks")
                            .decode("UTF-8"))
     builtins.name = "builtins"
-    return {**env, **_load(builtins, None, env, None)}
+    return _parse(builtins, None)
 
 
 @dataclass(frozen=True)
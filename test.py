@@ -3,7 +3,7 @@ from typing import Type
 from knitscript.astnodes import Pattern
 from knitscript.exporter import export_text
 from knitscript.interpreter import InterpretError, interpret_pattern
-from knitscript.loader import load_file
+from knitscript.loader import load_file, load_text
 from knitscript.verifier import verify_pattern
 
 
@@ -20,6 +20,13 @@ def check_output(filename: str, expected: str) -> bool:
     return actual == expected
 
 
+def check_text_output(text: str, expected: str) -> bool:
+    pattern = load_text(text)["main"]
+    assert isinstance(pattern, Pattern)
+    actual = export_text(interpret_pattern(pattern))
+    return actual == expected
+
+
 def expect_except(filename: str, exception_type: Type[Exception]) -> bool:
     # noinspection PyBroadException
     try:
@@ -231,3 +238,30 @@ test(lambda: check_output("test/rolling-ambiguous-repeats.ks",
                           "rep from ** 2 times\n" +
                           "RS: BO. (0 sts)"),
      "Repetitive row rolling should not create ambiguous row repeats")
+test(lambda: check_output("test/nested-row-repeats-across.ks",
+                          "WS: CO 2. (2 sts)\n" +
+                          "**\n" +
+                          "RS: P 2. (2 sts)\n" +
+                          "WS: K 2. (2 sts)\n" +
+                          "rep from ** 12 times\n" +
+                          "RS: BO 2. (0 sts)"),
+     "Repeating a pattern across should normalize nested row repeats")
+# Generated rather than checked in, since it only needs to be long enough to
+# go past the default recursion limit.
+test(lambda: check_text_output("pattern main\n" +
+                               "  row: CO 2.\n" +
+                               "  row: K 2.\n" * 1500 +
+                               "  row: BO 2.\n" +
+                               "end\n",
+                               "WS: CO 2. (2 sts)\n" +
+                               "**\n" +
+                               "RS: K 2. (2 sts)\n" +
+                               "rep from ** 1500 times\n" +
+                               "RS: BO 2. (0 sts)"),
+     "Should handle patterns with more rows than the recursion limit")
+test(lambda: check_output("test/repeat-zero-first-row.ks",
+                          "WS: CO 2. (2 sts)\n" +
+                          "RS: K 2. (2 sts)\n" +
+                          "WS: P 2. (2 sts)\n" +
+                          "RS: BO 2. (0 sts)"),
+     "Should find the starting side after removing empty row repeats")